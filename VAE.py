@@ -1,14 +1,103 @@
+import contextlib
+import math
+
 import torch
 import torch.nn as nn
 
 from opacus import PrivacyEngine
-
-# from torch.distributions.bernoulli import Bernoulli
-from torch.distributions.normal import Normal
+from opacus.grad_sample import (
+    create_or_extend_grad_sample,
+    register_grad_sampler,
+)
 
 from tqdm import tqdm
 
 
+def compile_net(net):
+    """Compiles the forward of net into fused kernels with torch.compile
+    (PyTorch >= 2.0), returning None on older versions. The bound forward
+    is compiled rather than the module itself so that state_dict keys
+    are unchanged
+    """
+    if not hasattr(torch, "compile"):
+        return None
+    return torch.compile(net.forward, mode="reduce-overhead", fullgraph=True)
+
+
+class CUDAPrefetcher:
+    """Wraps a DataLoader of (X,) batches, copying the next batch to the
+    GPU on a side stream while the current batch is being used
+    """
+
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = device
+        self.stream = torch.cuda.Stream(device)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.it = iter(self.loader)
+        self.preload()
+        return self
+
+    def preload(self):
+        try:
+            (Y_subset,) = next(self.it)
+        except StopIteration:
+            self.next_batch = None
+            return
+        with torch.cuda.stream(self.stream):
+            self.next_batch = Y_subset.to(self.device, non_blocking=True)
+
+    def __next__(self):
+        if self.next_batch is None:
+            raise StopIteration
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(self.stream)
+        X = self.next_batch
+        # X was allocated on the side stream but is consumed on this one
+        X.record_stream(current_stream)
+        self.preload()
+        return (X,)
+
+
+class CUDAGraphStep:
+    """Runs VAE.train_step as a CUDA graph captured once per batch shape"""
+
+    def __init__(self, vae, warmup_steps=3):
+        self.vae = vae
+        self.device = vae.device
+        self.warmup_steps = warmup_steps
+        # Batch shape -> (graph, static input, static loss)
+        self.graphs = {}
+
+    def __call__(self, X):
+        if self.warmup_steps > 0:
+            # Capture requires the warm-up to run on a side stream
+            stream = torch.cuda.Stream(self.device)
+            stream.wait_stream(torch.cuda.current_stream(self.device))
+            with torch.cuda.stream(stream):
+                loss = self.vae.train_step(X)
+            torch.cuda.current_stream(self.device).wait_stream(stream)
+            self.warmup_steps -= 1
+            return loss
+
+        if X.shape not in self.graphs:
+            static_X = X.clone()
+            graph = torch.cuda.CUDAGraph()
+            self.vae.optimizer.zero_grad(set_to_none=True)
+            with torch.cuda.graph(graph):
+                static_loss = self.vae.train_step(static_X)
+            self.graphs[X.shape] = (graph, static_X, static_loss)
+
+        graph, static_X, static_loss = self.graphs[X.shape]
+        static_X.copy_(X, non_blocking=True)
+        graph.replay()
+        return static_loss
+
+
 class Encoder(nn.Module):
     """Encoder, takes in x
     and outputs mu_z, sigma_z
@@ -22,16 +111,11 @@ class Encoder(nn.Module):
         hidden_dim=32,
         activation=nn.Tanh,
         device="cpu",
+        enable_compile=False,
     ):
         super().__init__()
-        if device == "gpu":
-            self.device = torch.device(
-                "cuda:0" if torch.cuda.is_available() else "cpu"
-            )
-            print(f"Encoder: {device} specified, {self.device} used")
-        else:
-            self.device = torch.device("cpu")
-            print(f"Encoder: {device} specified, {self.device} used")
+        # Resolved into a torch.device by VAE
+        self.requested_device = device
         output_dim = 2 * latent_dim
         self.latent_dim = latent_dim
         self.net = nn.Sequential(
@@ -41,11 +125,11 @@ class Encoder(nn.Module):
             activation(),
             nn.Linear(hidden_dim, output_dim),
         )
+        self.compiled_net = compile_net(self.net) if enable_compile else None
 
     def forward(self, x):
-        outs = self.net(x)
-        mu_z = outs[:, : self.latent_dim]
-        logsigma_z = outs[:, self.latent_dim :]
+        net = self.net if self.compiled_net is None else self.compiled_net
+        mu_z, logsigma_z = net(x).chunk(2, dim=-1)
         return mu_z, logsigma_z
 
 
@@ -60,21 +144,18 @@ class Decoder(nn.Module):
         hidden_dim=32,
         activation=nn.Tanh,
         device="cpu",
+        enable_compile=False,
     ):
         super().__init__()
 
         output_dim = num_continuous + sum(num_categories)
         self.num_continuous = num_continuous
         self.num_categories = num_categories
-
-        if device == "gpu":
-            self.device = torch.device(
-                "cuda:0" if torch.cuda.is_available() else "cpu"
-            )
-            print(f"Decoder: {device} specified, {self.device} used")
-        else:
-            self.device = torch.device("cpu")
-            print(f"Decoder: {device} specified, {self.device} used")
+        # Widths of the categorical logits, which come first, and of the
+        # continuous block of the output
+        self.split_sizes = (sum(num_categories), num_continuous)
+        # Resolved into a torch.device by VAE
+        self.requested_device = device
 
         self.net = nn.Sequential(
             nn.Linear(latent_dim, hidden_dim),
@@ -83,118 +164,285 @@ class Decoder(nn.Module):
             activation(),
             nn.Linear(hidden_dim, output_dim),
         )
+        self.compiled_net = compile_net(self.net) if enable_compile else None
 
     def forward(self, z):
-        return self.net(z)
+        net = self.net if self.compiled_net is None else self.compiled_net
+        return net(z)
 
 
 class Noiser(nn.Module):
+    """Learnable per-feature log standard deviation of the continuous
+    reconstruction noise, broadcast over the batch
+    """
+
     def __init__(self, num_continuous):
         super().__init__()
-        self.output_logsigma_fn = nn.Linear(
-            num_continuous, num_continuous, bias=True
-        )
-        torch.nn.init.zeros_(self.output_logsigma_fn.weight)
-        torch.nn.init.zeros_(self.output_logsigma_fn.bias)
-        self.output_logsigma_fn.weight.requires_grad = False
+        self.log_sigma = nn.Parameter(torch.zeros(num_continuous))
 
     def forward(self, X):
-        return self.output_logsigma_fn(X)
+        # X must stay in the autograd graph: the Opacus full backward hooks
+        # only fire once the gradient reaches the module's input
+        return self.log_sigma + 0 * X
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Earlier versions held log_sigma as the bias of a Linear layer
+        # with a frozen, zero weight
+        bias_key = prefix + "output_logsigma_fn.bias"
+        if bias_key in state_dict:
+            state_dict[prefix + "log_sigma"] = state_dict.pop(bias_key)
+            state_dict.pop(prefix + "output_logsigma_fn.weight", None)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+
+@register_grad_sampler(Noiser)
+def compute_noiser_grad_sample(layer, A, B, batch_dim=0):
+    """Computes per sample gradients for the Noiser, whose output is
+    log_sigma broadcast over the batch, so they are the backprops B
+    """
+    create_or_extend_grad_sample(layer.log_sigma, B, batch_dim)
 
 
 class VAE(nn.Module):
     """Combines encoder and decoder into full VAE model"""
 
-    def __init__(self, encoder, decoder, lr=1e-3):
+    def __init__(self, encoder, decoder, lr=1e-3, use_amp=False, device=None):
         super().__init__()
-        self.encoder = encoder.to(encoder.device)
-        self.decoder = decoder.to(decoder.device)
-        self.num_categories = self.decoder.num_categories
+        if use_amp and not hasattr(torch, "autocast"):
+            raise RuntimeError(
+                "use_amp requires PyTorch >= 1.10 (torch.autocast)"
+            )
+        if device is None:
+            device = encoder.requested_device
+        self.device = torch.device(
+            "cuda:0"
+            if device == "gpu" and torch.cuda.is_available()
+            else "cpu"
+        )
+        self.encoder = encoder
+        self.decoder = decoder
+        # Cached so that loss and generate do no per-batch list arithmetic
+        self.num_categories = tuple(self.decoder.num_categories)
+        self.total_categories = sum(self.num_categories)
+        self.n_cat_features = len(self.num_categories)
+        self.log_2pi = math.log(2 * math.pi)
         self.num_continuous = self.decoder.num_continuous
-        self.noiser = Noiser(self.num_continuous).to(decoder.device)
-        self.optimizer = torch.optim.Adam(self.parameters(), lr=lr)
+        self.noiser = Noiser(self.num_continuous)
+        self.to(self.device)
+        on_cuda = self.device.type == "cuda"
+        try:
+            # Single-kernel Adam step, capturable in CUDA graphs
+            self.optimizer = torch.optim.Adam(
+                self.parameters(), lr=lr, fused=on_cuda, capturable=on_cuda
+            )
+        except TypeError:
+            # PyTorch < 1.13
+            self.optimizer = torch.optim.Adam(self.parameters(), lr=lr)
         self.lr = lr
+        # Position of each categorical column in a (feature, category)
+        # layout padded to the largest cardinality, so that all categorical
+        # features can be handled by a single batched op
+        self.max_category = max(self.num_categories, default=0)
+        cat_pad_index = torch.tensor(
+            [
+                v * self.max_category + c
+                for v, n in enumerate(self.num_categories)
+                for c in range(n)
+            ],
+            dtype=torch.long,
+        )
+        self.register_buffer(
+            "cat_pad_index", cat_pad_index.to(self.device), persistent=False
+        )
+        # bf16 shares the fp32 exponent range, so no GradScaler is needed
+        self.use_amp = use_amp
+        self.amp_dtype = torch.bfloat16
+        self.gen_buffers = {}
+
+    def autocast(self):
+        if not self.use_amp:
+            return contextlib.nullcontext()
+        return torch.autocast(
+            device_type=self.device.type, dtype=self.amp_dtype
+        )
 
+    def pad_categories(self, x_cat, fill_value):
+        """Scatters the (N, sum(num_categories)) categorical block into a
+        (N, len(num_categories), max(num_categories)) tensor, filling the
+        unused slots of smaller features with fill_value
+        """
+        n_features = self.n_cat_features
+        padded = x_cat.new_full(
+            (x_cat.shape[0], n_features * self.max_category), fill_value
+        ).index_copy(1, self.cat_pad_index, x_cat)
+        return padded.view(x_cat.shape[0], n_features, self.max_category)
+
+    @torch.inference_mode()
     def reconstruct(self, X):
-        mu_z, logsigma_z = self.encoder(X)
-
-        x_recon = self.decoder(mu_z)
-        return x_recon
-
-    def generate(self, N):
-        z_samples = torch.randn_like(torch.ones((N, self.encoder.latent_dim)))
-        x_gen = self.decoder(z_samples)
-        x_gen_ = torch.ones_like(x_gen)
-        i = 0
-        for v in range(len(self.num_categories)):
-            x_gen_[
-                :, i : (i + self.num_categories[v])
-            ] = torch.distributions.one_hot_categorical.OneHotCategorical(
-                logits=x_gen[:, i : (i + self.num_categories[v])]
-            ).sample()
-            i = i + self.num_categories[v]
-        x_gen_[:, -self.num_continuous :] = x_gen[
-            :, -self.num_continuous :
-        ] + torch.exp(
-            self.noiser(x_gen[:, -self.num_continuous :])
-        ) * torch.randn_like(
-            x_gen[:, -self.num_continuous :]
-        )
+        with self.autocast():
+            mu_z, logsigma_z = self.encoder(X)
+
+            x_recon = self.decoder(mu_z)
+        return x_recon.float()
+
+    @torch.inference_mode()
+    def generate(self, N, reuse_buffers=False):
+        """With reuse_buffers, the latent samples and the output are written
+        into tensors cached for each (N, device), so the returned tensor is
+        overwritten by the next call with the same N. The cache is not
+        bounded; call vae.gen_buffers.clear() to release it
+        """
+        # Follows the decoder if the model was moved after construction
+        device = next(self.decoder.parameters()).device
+        if reuse_buffers:
+            key = (N, device)
+            if key not in self.gen_buffers:
+                self.gen_buffers[key] = (
+                    torch.empty((N, self.encoder.latent_dim), device=device),
+                    torch.empty(
+                        (N, sum(self.decoder.split_sizes)), device=device
+                    ),
+                )
+            z_samples, x_gen_ = self.gen_buffers[key]
+            z_samples.normal_()
+        else:
+            z_samples = torch.randn(
+                (N, self.encoder.latent_dim), device=device
+            )
+        with self.autocast():
+            x_gen = self.decoder(z_samples)
+        x_gen = x_gen.float()
+        if not reuse_buffers:
+            x_gen_ = torch.empty_like(x_gen)
+        split_sizes = self.decoder.split_sizes
+        x_gen_cat, x_gen_cont = torch.split(x_gen, split_sizes, dim=1)
+        out_cat, out_cont = torch.split(x_gen_, split_sizes, dim=1)
+        if self.total_categories:
+            logits = self.pad_categories(x_gen_cat, float("-inf"))
+            # Gumbel-max trick: the argmax of the logits perturbed by
+            # -log(E), E ~ Exp(1), is a sample from the categorical
+            # distribution they define. E is kept above zero so a padded
+            # -inf slot can never become -inf + inf = NaN and win the argmax
+            tiny = torch.finfo(logits.dtype).tiny
+            exponentials = torch.empty_like(logits).exponential_()
+            gumbels = -exponentials.clamp_min_(tiny).log()
+            samples = torch.nn.functional.one_hot(
+                (logits + gumbels).argmax(-1), self.max_category
+            )
+            out_cat.copy_(samples.flatten(1)[:, self.cat_pad_index])
+        if self.num_continuous:
+            sigma = torch.exp(self.noiser(x_gen_cont))
+            out_cont.copy_(x_gen_cont + sigma * torch.randn_like(x_gen_cont))
         return x_gen_
 
     def loss(self, X):
-        mu_z, logsigma_z = self.encoder(X)
+        return self._loss(X, X.shape[0])
 
-        p = Normal(torch.zeros_like(mu_z), torch.ones_like(mu_z))
-        q = Normal(mu_z, torch.exp(logsigma_z))
+    def _loss(self, X, ce_divisor):
+        # ce_divisor is the batch size the categorical cross-entropy is
+        # averaged over, which differs from X.shape[0] under vmap
+        mu_z, logsigma_z = self.encoder(X)
+        # Keep the KL and log-likelihood reductions in fp32 under autocast
+        mu_z, logsigma_z = mu_z.float(), logsigma_z.float()
 
-        encoder_loss = torch.sum(torch.distributions.kl_divergence(q, p))
+        # Closed-form KL(N(mu_z, sigma_z) || N(0, 1))
+        encoder_loss = 0.5 * torch.sum(
+            mu_z.pow(2) + torch.exp(2 * logsigma_z) - 1.0 - 2 * logsigma_z
+        )
 
         s = torch.randn_like(mu_z)
-        z_samples = mu_z + s * torch.exp(logsigma_z)
+        z_samples = torch.addcmul(mu_z, s, torch.exp(logsigma_z))
 
-        x_recon = self.decoder(z_samples)
+        x_recon = self.decoder(z_samples).float()
+        split_sizes = self.decoder.split_sizes
+        x_recon_cat, x_recon_cont = torch.split(x_recon, split_sizes, dim=1)
+        X_cat, X_cont = torch.split(X, split_sizes, dim=1)
 
         categoric_loglik = 0
-        if sum(self.num_categories) != 0:
-            i = 0
-            for v in range(len(self.num_categories)):
-                categoric_loglik += -torch.nn.functional.cross_entropy(
-                    x_recon[:, i : (i + self.num_categories[v])],
-                    torch.max(X[:, i : (i + self.num_categories[v])], 1)[1],
-                ).sum()
-                i = i + self.decoder.num_categories[v]
+        if self.total_categories:
+            logits = self.pad_categories(x_recon_cat, float("-inf"))
+            targets = self.pad_categories(X_cat, 0.0).argmax(-1)
+            # Summing over the batch and dividing by its size keeps the
+            # per-feature batch mean of cross_entropy's default reduction
+            categoric_loglik = (
+                -torch.nn.functional.cross_entropy(
+                    logits.transpose(1, 2), targets, reduction="sum"
+                )
+                / ce_divisor
+            )
 
         gauss_loglik = 0
-        if self.decoder.num_continuous != 0:
+        if self.num_continuous:
+            log_scale = self.noiser(x_recon_cont)
             gauss_loglik = (
-                Normal(
-                    loc=x_recon[:, -self.num_continuous :],
-                    scale=torch.exp(
-                        self.noiser(x_recon[:, -self.num_continuous :])
-                    ),
-                )
-                .log_prob(X[:, -self.num_continuous :])
-                .sum()
-            )
+                -0.5 * ((X_cont - x_recon_cont) * torch.exp(-log_scale)).pow(2)
+                - log_scale
+                - 0.5 * self.log_2pi
+            ).sum()
 
         reconstruct_loss = -(categoric_loglik + gauss_loglik)
 
         return encoder_loss + reconstruct_loss
 
-    def train(self, x_dataloader, n_epochs, logging_freq=1):
+    @contextlib.contextmanager
+    def eager_nets(self):
+        """Temporarily runs the encoder and decoder without compilation"""
+        modules = (self.encoder, self.decoder)
+        compiled_nets = [m.compiled_net for m in modules]
+        for m in modules:
+            m.compiled_net = None
+        try:
+            yield
+        finally:
+            for m, compiled_net in zip(modules, compiled_nets):
+                m.compiled_net = compiled_net
+
+    def is_compiled(self):
+        return any(
+            m.compiled_net is not None for m in (self.encoder, self.decoder)
+        )
+
+    def batches(self, x_dataloader):
+        if self.device.type == "cuda":
+            return CUDAPrefetcher(x_dataloader, self.device)
+        return x_dataloader
+
+    def train_step(self, X):
+        self.optimizer.zero_grad(set_to_none=True)
+        with self.autocast():
+            loss = self.loss(X)
+        loss.backward()
+        self.optimizer.step()
+        return loss.detach()
+
+    def train(
+        self, x_dataloader, n_epochs, logging_freq=1, use_cuda_graph=False
+    ):
+        """x_dataloader should use pin_memory=True for asynchronous copies
+        use_cuda_graph: replay the training step as CUDA graphs (see README)
+        """
+        train_step = self.train_step
+        if use_cuda_graph and self.optimizer.defaults.get("capturable"):
+            train_step = CUDAGraphStep(self)
+
+        if self.is_compiled():
+            # Trigger compilation on a batch of the training shape so the
+            # trace cost is not folded into the first epoch
+            (Y_subset,) = next(iter(x_dataloader))
+            X = Y_subset.to(self.device, non_blocking=True)
+            with self.autocast():
+                self.loss(X)
+
+        batches = self.batches(x_dataloader)
         # mean_norm = 0
         # counter = 0
         for epoch in range(n_epochs):
-            train_loss = 0.0
-
-            for batch_idx, (Y_subset,) in enumerate(tqdm(x_dataloader)):
-                self.optimizer.zero_grad()
-                loss = self.loss(Y_subset.to(self.encoder.device))
-                loss.backward()
-                self.optimizer.step()
+            # Accumulated on the device to avoid a host sync every batch
+            train_loss = torch.zeros((), device=self.device)
 
-                train_loss += loss.item()
+            for batch_idx, (Y_subset,) in enumerate(tqdm(batches)):
+                X = Y_subset.to(self.device, non_blocking=True)
+                train_loss += train_step(X)
 
                 # counter += 1
                 # l2_norm = 0
@@ -206,6 +454,7 @@ class VAE(nn.Module):
                 # mean_norm = (mean_norm * (counter - 1) + l2_norm) / counter
 
             if epoch % logging_freq == 0:
+                train_loss = train_loss.item()
                 print(f"\tEpoch: {epoch:2}. Total loss: {train_loss:11.2f}")
                 # print(f"\tMean norm: {mean_norm}")
         # self.mean_norm = mean_norm
@@ -220,7 +469,12 @@ class VAE(nn.Module):
         target_delta=1e-5,
         logging_freq=1,
         sample_rate=0.1,
+        use_vmap=False,
     ):
+        """use_vmap: per-sample gradients from torch.func (see README)"""
+        if use_vmap and not hasattr(torch, "func"):
+            raise RuntimeError("use_vmap requires PyTorch >= 2.0 (torch.func)")
+
         if noise_scale is not None:
             self.privacy_engine = PrivacyEngine(
                 self,
@@ -241,23 +495,96 @@ class VAE(nn.Module):
                 epochs=n_epochs,
                 max_grad_norm=C,
             )
-        self.privacy_engine.attach(self.optimizer)
-
-        for epoch in range(n_epochs):
-            train_loss = 0.0
-            # print(self.get_privacy_spent(target_delta))
-
-            for batch_idx, (Y_subset,) in enumerate(tqdm(x_dataloader)):
-                self.optimizer.zero_grad()
-                loss = self.loss(Y_subset.to(self.encoder.device))
-                loss.backward()
-                self.optimizer.step()
-                train_loss += loss.item()
+        if use_vmap:
+            self.privacy_engine.module.remove_hooks()
+        else:
+            self.privacy_engine.attach(self.optimizer)
+
+        batches = self.batches(x_dataloader)
+        # Opacus computes per-sample gradients from module hooks,
+        # which compiled graphs bypass
+        with self.eager_nets():
+            for epoch in range(n_epochs):
+                # Accumulated on the device to avoid a host sync every batch
+                train_loss = torch.zeros((), device=self.device)
                 # print(self.get_privacy_spent(target_delta))
-                # print(loss.item())
 
-            if epoch % logging_freq == 0:
-                print(f"\tEpoch: {epoch:2}. Total loss: {train_loss:11.2f}")
+                for batch_idx, (Y_subset,) in enumerate(tqdm(batches)):
+                    X = Y_subset.to(self.device, non_blocking=True)
+                    # No autocast here: the Opacus per-sample gradient hooks
+                    # are not autocast-safe
+                    if use_vmap:
+                        loss = self.vmap_dp_step(X, C)
+                    else:
+                        # Opacus' zero_grad takes no set_to_none argument
+                        self.optimizer.zero_grad()
+                        loss = self.loss(X)
+                        loss.backward()
+                        self.optimizer.step()
+                    train_loss += loss.detach()
+                    # print(self.get_privacy_spent(target_delta))
+                    # print(loss.item())
+
+                if epoch % logging_freq == 0:
+                    train_loss = train_loss.item()
+                    print(
+                        f"\tEpoch: {epoch:2}. Total loss: {train_loss:11.2f}"
+                    )
+
+    def vmap_dp_step(self, X, C):
+        """DP-SGD step with per-sample gradients from torch.func.vmap"""
+        params = {
+            name: p.detach()
+            for name, p in self.named_parameters()
+            if p.requires_grad
+        }
+
+        n = X.shape[0]
+        vae = self
+
+        class SampleLoss(nn.Module):
+            # Holds the VAE's submodules under the same names, so that
+            # functional_call can swap in params around VAE._loss
+            def __init__(self):
+                super().__init__()
+                for name, module in vae.named_children():
+                    self.add_module(name, module)
+
+            def forward(self, x):
+                # Opacus scales the per-sample gradients by the batch size
+                return n * vae._loss(x.unsqueeze(0), n)
+
+        sample_loss_module = SampleLoss()
+
+        def sample_loss(params, x):
+            return torch.func.functional_call(
+                sample_loss_module, params, (x,)
+            )
+
+        grad_samples, losses = torch.func.vmap(
+            torch.func.grad_and_value(sample_loss),
+            in_dims=(None, 0),
+            randomness="different",
+        )(params, X)
+
+        # Flat clipping over all parameters, as in ConstantFlatClipper
+        norms = torch.stack(
+            [g.flatten(1).norm(2, dim=1) for g in grad_samples.values()],
+            dim=1,
+        ).norm(2, dim=1)
+        clip_factor = (C / (norms + 1e-6)).clamp(max=1.0)
+
+        self.privacy_engine.steps += 1
+        for name, p in self.named_parameters():
+            if name in grad_samples:
+                p.grad = torch.einsum(
+                    "n,n...->...", clip_factor, grad_samples[name]
+                )
+                p.grad += self.privacy_engine._generate_noise(C, p)
+                p.grad /= n
+        self.optimizer.step()
+        # Each sample's value is n times its share of the batch loss
+        return losses.sum() / n
 
     def get_privacy_spent(self, delta):
         if hasattr(self, "privacy_engine"):
@@ -273,3 +600,4 @@ class VAE(nn.Module):
 
     def load(self, filename):
         self.load_state_dict(torch.load(filename))
+        self.gen_buffers.clear()
@@ -0,0 +1,46 @@
+import unittest
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from VAE import Decoder, Encoder, VAE
+
+
+class DiffPrivTrainTest(unittest.TestCase):
+    def test_one_epoch_smoke(self):
+        torch.manual_seed(0)
+        N = 64
+        batch_size = 16
+        num_continuous = 2
+        num_categories = [3, 2]
+        X = torch.cat(
+            [
+                torch.nn.functional.one_hot(torch.randint(n, (N,)), n).float()
+                for n in num_categories
+            ]
+            + [torch.randn(N, num_continuous)],
+            dim=1,
+        )
+        data_loader = DataLoader(TensorDataset(X), batch_size=batch_size)
+
+        latent_dim = 2
+        encoder = Encoder(X.shape[1], latent_dim)
+        decoder = Decoder(
+            latent_dim, num_continuous, num_categories=num_categories
+        )
+        vae = VAE(encoder, decoder)
+        vae.diff_priv_train(
+            data_loader,
+            n_epochs=1,
+            C=10,
+            noise_scale=1.0,
+            sample_rate=batch_size / N,
+        )
+
+        self.assertEqual(vae.privacy_engine.steps, N // batch_size)
+        # The Noiser gets per-sample gradients, so it is updated too
+        self.assertFalse(
+            torch.equal(vae.noiser.log_sigma, torch.zeros(num_continuous))
+        )
+        for p in vae.parameters():
+            self.assertTrue(torch.isfinite(p).all())